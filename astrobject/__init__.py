@@ -1,4 +1,3 @@
-
 #
 # This is the astrobject library
 #
@@ -6,15 +5,20 @@
 
 __version__ = "0.4.1"
 
-from baseobject   import *
-
-from photometry   import *
-from spectroscopy import *
-
-# don't invert collections and collection
-from collections import *
-from collection  import *
-from instruments.instrument import *
+from .baseobject   import BaseObject, get_target
 
+from .photometry   import get_image, get_photopoint
+from .spectroscopy import get_spectrum
 
+from .collections  import get_photomap, get_sepobject, get_photomapcollection,\
+     get_massestimator
+from .collection   import ImageCollection
+from .instruments.instrument import get_instrument, get_catalogue, fetch_catalogue,\
+     fetch_catalogues_parallel
 
+__all__ = ["BaseObject","get_target",
+           "get_image","get_photopoint","get_spectrum",
+           "get_photomap","get_sepobject","get_photomapcollection",
+           "get_massestimator","ImageCollection",
+           "get_instrument","get_catalogue","fetch_catalogue",
+           "fetch_catalogues_parallel"]
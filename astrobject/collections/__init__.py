@@ -1,10 +1,10 @@
 #
 # Collection from the Astrobject
 #
-from photospatial import *
-from photodiagnostics import *
+from .photospatial import get_photomap, get_sepobject, get_photomapcollection
+from .photodiagnostics import get_massestimator
 #import photospectral
 #import phototemporal
 
-
-
+__all__ = ["get_photomap","get_sepobject","get_photomapcollection",
+           "get_massestimator"]
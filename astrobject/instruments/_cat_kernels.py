@@ -0,0 +1,92 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This module gather the compiled kernels used by the catalogues
+(numba is optional; without it the kernels run as plain python)"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_IMPORTED = True
+except ImportError:
+    NUMBA_IMPORTED = False
+    prange = range
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+__all__ = ["count_neighbors","NUMBA_IMPORTED"]
+
+# smallest cell size, such that the cell keys fit in int64
+_MIN_CELLSIZE = 4./2**20
+
+
+def count_neighbors(xyz, chord):
+    """ count, for each of the given unit-sphere points, the number of
+    points (itself included) closer than `chord` (cartesian distance).
+    The points are binned into a uniform grid of cubic cells of
+    size >= `chord`, such that only the 27 cells around each point
+    need to be tested.
+
+    Parameters
+    ----------
+    xyz: [(N,3) float array]
+        cartesian coordinates of the points (see utils.tools.radec_to_xyz)
+
+    chord: [float]
+        chord distance (2*sin(angle/2) for an angular distance)
+
+    Returns
+    -------
+    array of int
+    """
+    xyz = np.ascontiguousarray(xyz)
+    ijk, cell_keys, cell_start, cell_count, cell_index, ncell = \
+      build_grid(xyz, chord)
+    return count_within_chord(xyz, ijk, cell_keys, cell_start, cell_count,
+                              cell_index, ncell, xyz.dtype.type(chord**2))
+
+def build_grid(xyz, cellsize):
+    """ sort the points into a uniform grid of cubic cells covering [-1,1]^3
+
+    Returns
+    -------
+    ijk (cell coordinates of each point), cell_keys (sorted keys of the
+    non-empty cells), cell_start, cell_count (location of the cell entries
+    in cell_index), cell_index (point indexes sorted by cell), ncell
+    """
+    cellsize = max(cellsize, _MIN_CELLSIZE)
+    ncell = int(np.floor(2./cellsize)) + 3
+    # - +1 such that the neighboring cells of any point have positive coords
+    ijk  = np.floor((np.asarray(xyz, dtype="float64") + 1.)/cellsize).astype("int64") + 1
+    keys = (ijk[:,0]*ncell + ijk[:,1])*ncell + ijk[:,2]
+    cell_index = np.argsort(keys, kind="mergesort")
+    cell_keys, cell_start, cell_count = np.unique(keys[cell_index], return_index=True,
+                                                  return_counts=True)
+    return ijk, cell_keys, cell_start.astype("int64"), cell_count.astype("int64"),\
+      cell_index.astype("int64"), ncell
+
+@njit(parallel=True, fastmath=True, cache=True)
+def count_within_chord(xyz, ijk, cell_keys, cell_start, cell_count, cell_index,
+                       ncell, r2):
+    """ number of points within sqrt(`r2`) of each point, using the
+    grid made by build_grid """
+    npoints = xyz.shape[0]
+    counts  = np.zeros(npoints, dtype=np.int64)
+    for p in prange(npoints):
+        n = 0
+        for di in range(-1,2):
+            for dj in range(-1,2):
+                for dk in range(-1,2):
+                    key = ((ijk[p,0]+di)*ncell + ijk[p,1]+dj)*ncell + ijk[p,2]+dk
+                    loc = np.searchsorted(cell_keys, key)
+                    if loc >= cell_keys.shape[0] or cell_keys[loc] != key:
+                        continue
+                    for q in range(cell_start[loc], cell_start[loc]+cell_count[loc]):
+                        o  = cell_index[q]
+                        dx = xyz[o,0]-xyz[p,0]
+                        dy = xyz[o,1]-xyz[p,1]
+                        dz = xyz[o,2]-xyz[p,2]
+                        if dx*dx + dy*dy + dz*dz <= r2:
+                            n += 1
+        counts[p] = n
+    return counts
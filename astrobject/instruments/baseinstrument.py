@@ -1,9 +1,11 @@
 #! /usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import hashlib
 import warnings
+from collections import OrderedDict
 import numpy as np
-from sncosmo import get_bandpass
+import scipy
 
 # - astropy
 from astropy import coordinates,units
@@ -15,11 +17,33 @@ from .. import astrometry
 from ..photometry import Image,get_photopoint
 from ..baseobject import BaseObject, WCSHandler
 from ..utils.decorators import _autogen_docstring_inheritance
-from ..utils.tools import kwargs_update,mag_to_flux,load_pkl,dump_pkl
+from ..utils.tools import kwargs_update,mag_to_flux,load_pkl,dump_pkl,radec_to_xyz
 from ..utils import shape
+from ._cat_kernels import count_neighbors, NUMBA_IMPORTED
 
 __all__ = ["Instrument"]
 
+# - cKDTree.query_ball_point options of the installed scipy:
+#   return_length (scipy>=1.3) avoids building the lists of neighbors
+#   and workers (scipy>=1.6) uses all the cores
+_SCIPY_VERSION = tuple(int(v) for v in scipy.__version__.split(".")[:2])
+_BALL_POINT_KWARGS = dict(return_length=True, workers=-1) if _SCIPY_VERSION >= (1,6) else \
+  dict(return_length=True) if _SCIPY_VERSION >= (1,3) else None
+
+def _count_ball_point_(tree, points, r):
+    """ number of `tree` entries within `r` of each of the `points`.
+    Older scipy versions (e.g. 1.2, the last one for python 2.7)
+    count the returned lists of neighbors.
+    """
+    if _BALL_POINT_KWARGS is None:
+        return np.asarray([len(l) for l in tree.query_ball_point(points, r)], dtype="int")
+    return tree.query_ball_point(points, r, **_BALL_POINT_KWARGS)
+
+def get_bandpass(*args, **kwargs):
+    """ sncosmo's get_bandpass (sncosmo is only imported when needed) """
+    from sncosmo import get_bandpass as get_sncosmo_bandpass
+    return get_sncosmo_bandpass(*args, **kwargs)
+
 class Instrument( Image ):
     """
     """
@@ -173,7 +197,10 @@ class Catalogue( WCSHandler ):
     PROPERTIES         = ["filename","data","header"]
     SIDE_PROPERTIES    = ["fovcontours","fovmask","matchedmask",
                           "lbda","excluded_list"]
-    DERIVED_PROPERTIES = ["fits","naround","naround_nofovcut","contours"]
+    DERIVED_PROPERTIES = ["fits","naround","naround_nofovcut","contours",
+                          "kdtree"]
+    # number of KD-trees (i.e. of entry selections) kept in memory
+    KDTREE_CACHE_SIZE  = 4
 
 
     def __init__(self, catalogue_file=None,
@@ -278,7 +305,7 @@ class Catalogue( WCSHandler ):
         self._derived_properties["fits"] = fits
 
         
-    def create(self,data,header,force_it=True,**build):
+    def create(self,data,header,force_it=True,copy=True,**build):
         """ builds the catalogue
 
         Parameters
@@ -297,6 +324,10 @@ class Catalogue( WCSHandler ):
         force_it: [bool] -optional-
             if data already exists, set force_it to true to overwrite it.
 
+        copy: [bool] -optional-
+            set to False to use the given data without copying them
+            (the catalogue will then share the data's memory)
+
         **build goes to the build dictorty (key_mag, data_slice etc.)
         
         Returns
@@ -307,11 +338,12 @@ class Catalogue( WCSHandler ):
             raise AttributeError("'data' is already defined."+\
                     " Set force_it to True if you really known what you are doing")
 
-        self._properties["data"] = Table(data)
+        self._properties["data"] = Table(data, copy=copy)
         self._properties["header"] = header if header is not None \
           else pf.Header()
         self.set_starsid(build.pop("key_class",None),build.pop("value_star",None))
         self._build_properties = kwargs_update(self._build_properties,**build)
+        self._reset_caches_()
         # -------------------------------
         # - Try to get the fundamentals
         if self._build_properties['key_ra'] is None:
@@ -367,6 +399,7 @@ class Catalogue( WCSHandler ):
         from astropy.table import join
         
         self._properties["data"] = join(self.data,datatable,join_type='outer')
+        self._reset_caches_()
         self._update_fovmask_()
 
     def merge(self,catalogue_):
@@ -425,6 +458,7 @@ class Catalogue( WCSHandler ):
         """ provide the catalogue entry  associated with coordinates (Ra and Dec) """
         self._build_properties["key_ra"] = key_ra
         self._build_properties["key_dec"] = key_dec
+        self._reset_caches_()
         
     def set_wcs(self,wcs,force_it=False,update_fovmask=True):
         """
@@ -748,6 +782,49 @@ class Catalogue( WCSHandler ):
             
         return coordinates.match_coordinates_sky(skytarget, catsky)[:2]
         
+    def match_kth(self, ra, dec, k=1, wcs_coords=True, mask=None, infov=True):
+        """ get the index of the `k`-th nearest (masked-)catalogue entry
+        of the given coordinates.
+        Only the `k`-th neighbor is computed (not the k nearest ones as
+        astropy's match_coordinates_sky does with nthneighbor=k), so this
+        is the method to use for large `k`.
+        
+        Parameters
+        ----------
+        ra, dec : [float (or array-of), float (or array-of)]
+            Coordinates that should be matched
+
+        k: [int] -optional-
+            the neighbor rank (1 being the nearest)
+
+        wcs_coords: [bool] -optional-
+            True if the ra and dec are given in degree. Set to False
+            if you provided the pixel coordinates.
+
+        mask, infov: -optional-
+            selection of the catalogue entries (see get_nearest_idx).
+            **CAUTION** The idx will then be that of the **mask-catalogue**
+            
+        Returns
+        -------
+        idx, sep2d (idx is the number of entries and sep2d is inf if
+        there are less than k entries)
+        """
+        # --------------
+        # - Input 
+        if not wcs_coords and not self.has_wcs():
+            raise AttributeError("Needs a wcs solution to get pixel coordinates")
+        if not wcs_coords:
+            ra,dec = np.asarray(self.wcs.pix2world(ra,dec)).T
+            
+        # -------------
+        # - Cat matching (cached tree, k as a list)
+        tree = self.get_kdtree(mask=mask, infov=infov)
+        dist, idx = tree.query(radec_to_xyz(ra,dec), k=[k])
+        dist = dist[:,0]
+        sep  = np.where(np.isfinite(dist), 2*np.arcsin(np.clip(dist/2., 0, 1)), np.inf)
+        return idx[:,0], coordinates.Angle(sep*units.radian).to("degree")
+    
     def get_idx_around(self,ra,dec,radius,runits="arcsec",wcs_coords=True,
                        infov=True):
         """
@@ -772,6 +849,99 @@ class Catalogue( WCSHandler ):
         return catsky.search_around_sky(skytarget,
                                         radius*units.Unit(runits))[1:3]
         
+    def get_kdtree(self, mask=None, infov=True):
+        """ get the KD-tree (scipy's cKDTree) built on the unit-sphere
+        cartesian coordinates of the (masked) catalogue entries.
+        The trees of the last KDTREE_CACHE_SIZE selections (mask/infov)
+        are kept in memory, so repeated spatial queries on the same
+        entries share the same tree. They are dropped when the data
+        or the coordinate keys change (create, join, set_coord_keys).
+
+        Parameters
+        ----------
+        mask: [bool-array] -optional-
+            Mask the catalogue entries used to build the tree.
+            (same convention as for the `get` method)
+
+        infov: [bool] -optional-
+            Use only the entries within the fov (fovmask).
+
+        Returns
+        -------
+        scipy.spatial.cKDTree (its `data` are the x,y,z coordinates)
+        """
+        from scipy.spatial import cKDTree
+        if self._derived_properties["kdtree"] is None:
+            self._derived_properties["kdtree"] = OrderedDict()
+        trees = self._derived_properties["kdtree"]
+        
+        idx = np.ascontiguousarray(self._selection_idx_(mask=mask, infov=infov))
+        key = (len(idx), hashlib.sha1(idx.tobytes()).hexdigest())
+        if key not in trees:
+            if len(trees) >= self.KDTREE_CACHE_SIZE:
+                trees.popitem(last=False)
+            trees[key] = cKDTree(self._get_xyz_(idx), balanced_tree=False,
+                                 compact_nodes=False)
+            
+        return trees[key]
+    
+    def get_nobjects_around(self, ang_distance, mask=None, infov=True,
+                            chunksize=65536, grid=False):
+        """ count, for each (masked) catalogue entry, the number of (masked)
+        entries within `ang_distance` (the entry itself included).
+        This uses the cached KD-tree (see get_kdtree) or, on request,
+        a compiled grid search. The list of matching pairs is never built.
+
+        Parameters
+        ----------
+        ang_distance: [astropy.Quantity]
+            angular distance within which entries are counted.
+
+        mask, infov: -optional-
+            selection of the catalogue entries (see get_kdtree)
+
+        chunksize: [int] -optional-
+            the tree is queried by chunks of `chunksize` entries
+            to limit the peak memory usage.
+
+        grid: [bool] -optional-
+            use the numba grid search instead of the KD-tree. This is
+            faster only for large and dense fields (many neighbors per
+            entry) and requires numba (the KD-tree is used otherwise).
+
+        Returns
+        -------
+        array of int
+        """
+        # - angular distance -> chord distance on the unit sphere
+        chord = 2*np.sin(ang_distance.to("rad").value/2.)
+        # - compiled grid counting (on request)
+        #   float32 unit vectors are precise to ~0.02 arcsec and halve
+        #   the memory traffic of the distance loop.
+        if grid and not NUMBA_IMPORTED:
+            warnings.warn("numba is not installed, the KD-tree is used instead of the grid")
+        elif grid:
+            xyz = self._get_xyz_(self._selection_idx_(mask=mask, infov=infov))
+            return count_neighbors(xyz.astype("float32"), chord)
+        
+        tree  = self.get_kdtree(mask=mask, infov=infov)
+        counts = np.empty(tree.n, dtype="int")
+        for i in range(0, tree.n, chunksize):
+            counts[i:i+chunksize] = _count_ball_point_(tree, tree.data[i:i+chunksize], chord)
+        return counts
+    
+    def _selection_idx_(self, mask=None, infov=True):
+        """ indexes of the catalogue entries selected by mask and infov
+        (see `get`) """
+        idx = np.arange(self.nobjects)
+        if infov:
+            idx = idx[self.fovmask]
+        return idx if mask is None else idx[mask]
+
+    def _get_xyz_(self, idx):
+        """ unit-sphere cartesian coordinates of the `idx` entries """
+        return radec_to_xyz(np.asarray(self._ra)[idx], np.asarray(self._dec)[idx])
+    
     def get_contour_mask(self, contours, infov=True):
         """  returns a boolean array for the given contours """
         if contours is None:
@@ -909,6 +1079,11 @@ class Catalogue( WCSHandler ):
         raise NotImplementedError("to be done")
     # ------------------
     # --  Update
+    def _reset_caches_(self):
+        """ drop the derived quantities cached on the current data
+        (to be called whenever the data or their keys change) """
+        self._derived_properties["kdtree"] = None
+        
     def _update_fovmask_(self):
         """
         """
@@ -1209,16 +1384,15 @@ class Catalogue( WCSHandler ):
     # ----------------------
     # - Alone Object
     def define_around(self,ang_distance):
-        """
+        """ count the number of entries within `ang_distance` of each entry
+        (with and without the fov cut). See get_nobjects_around
         """
         # -- FoV cut
-        idxcatalogue = self.sky_radec.search_around_sky(self.sky_radec,
-                                                        ang_distance)[0]
-        self._derived_properties["naround"] = np.bincount(idxcatalogue)
+        self._derived_properties["naround"] = \
+          self.get_nobjects_around(ang_distance, infov=True)
         # -- no FoV cut
-        _idxcatalogue = self._sky_radec.search_around_sky(self._sky_radec,
-                                                        ang_distance)[0]
-        self._derived_properties["naround_nofovcut"] = np.bincount(_idxcatalogue)
+        self._derived_properties["naround_nofovcut"] = \
+          self.get_nobjects_around(ang_distance, infov=False)
         
     def _is_around_defined(self):
         return self._derived_properties["naround"] is not None
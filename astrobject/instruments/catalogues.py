@@ -1,14 +1,263 @@
 #! /usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
+import re
+import time
+import tempfile
+import hashlib
+import logging
+import warnings
+from functools import wraps
 import numpy as np
-from sncosmo import get_bandpass
 
 from .baseinstrument import Catalogue, coordinates,units
+from .sdss import SDSS_INFO
 # -- here load all the object that could be parsed
 from ..utils.tools import kwargs_update
 from ..utils.decorators import _autogen_docstring_inheritance, make_method
 
+_log = logging.getLogger(__name__)
+
+# Format in which the Vizier tables are downloaded:
+#  - 'fits': binary FITS table (fast to parse, default)
+#  - 'votable': astroquery's VOTable query (slow XML parsing, but use it
+#               if a catalogue comes out wrong in fits)
+VIZIER_FORMAT = "fits"
+VIZIER_SERVER = "vizier.u-strasbg.fr"
+VIZIER_TIMEOUT = 60 # seconds (as astroquery's Vizier)
+TAPVIZIER_URL = "http://tapvizier.u-strasbg.fr/TAPVizieR/tap"
+# Local cache of the Vizier queries (set VIZIER_CACHE_DIR to None to disable it)
+# VIZIER_CACHE_TTL: lifetime of the cached queries in second (None: no limit)
+VIZIER_CACHE_DIR = os.path.join(os.path.expanduser("~"),".astrobject","vizier_cache")
+VIZIER_CACHE_TTL = None
+
+# Basic columns queried (position, ID, object-type, magnitudes)
+def _mag_columns_(bands):
+    return tuple(c for band in bands for c in ("%smag"%band,"e_%smag"%band))
+
+_GAIA_COLUMNS = ("RA_ICRS","DE_ICRS","e_RA_ICRS","e_DE_ICRS","Source","Dup",
+                 "o_<Gmag>","<FG>","e_<FG>","<Gmag>","Var")
+_SDSS_COLUMNS = ("cl","objID",#"SDSS9",
+                 "RAJ2000","e_RAJ2000","DEJ2000","e_DEJ2000",
+                 #"ObsDate","Q"#"mode",
+                 ) + _mag_columns_(SDSS_INFO["bands"])
+_MASS_COLUMNS = ("2MASS","RAJ2000","DEJ2000") + _mag_columns_(["J","H","K"])
+_WISE_COLUMNS = ("AllWISE","ID","RAJ2000","DEJ2000") + \
+  _mag_columns_(["J","H","K","W1","W2","W3","W4"])
+# SDSS quality cut: primary objects (mode=1) of good quality (Q=2 or 3)
+_SDSS_QUALITY = {"mode":"1","Q":"2,3"}
+
+# Effective wavelengths [Angstrom]
+_MASS_LBDA = {"Jmag":12350, "Hmag":16620, "Kmag":21590}
+_SDSS_LBDA = {} # filled on demand by _get_sdss_lbda_
+
+def _get_sdss_lbda_(band):
+    """ effective wavelength of the sncosmo's sdss`band` bandpass
+    (the bandpass is loaded only once per band) """
+    if band not in _SDSS_LBDA:
+        from sncosmo import get_bandpass
+        _SDSS_LBDA[band] = get_bandpass("sdss%s"%band).wave_eff
+    return _SDSS_LBDA[band]
+
+
+# ============================= #
+#                               #
+# Vizier Queries                #
+#                               #
+# ============================= #
+def _cached_vizier(func):
+    """ Decorator storing the Table returned by the Vizier query `func`
+    in VIZIER_CACHE_DIR. The file name is a hash of the query arguments
+    such that an identical query is read from disk instead of Vizier.
+    """
+    @wraps(func)
+    def wrapper(catalog, columns, column_filters, center, radius,
+                row_limit="unlimited", **kwargs):
+        if VIZIER_CACHE_DIR is None:
+            return func(catalog, columns, column_filters, center, radius,
+                        row_limit=row_limit, **kwargs)
+        from astropy.table import Table
+        
+        key = repr((catalog, str(center), str(radius), tuple(columns),
+                    sorted(column_filters.items()), row_limit,
+                    sorted(kwargs.items()), VIZIER_FORMAT))
+        cachefile = os.path.join(VIZIER_CACHE_DIR,
+                                 hashlib.sha1(key.encode("utf-8")).hexdigest()+".fits")
+        if os.path.isfile(cachefile) and \
+          (VIZIER_CACHE_TTL is None or time.time()-os.path.getmtime(cachefile) < VIZIER_CACHE_TTL):
+            _log.debug("Vizier query read from %s", cachefile)
+            return Table.read(cachefile, format="fits")
+        
+        t = func(catalog, columns, column_filters, center, radius,
+                 row_limit=row_limit, **kwargs)
+        tmpfile = None
+        try:
+            try:
+                os.makedirs(VIZIER_CACHE_DIR)
+            except OSError:
+                # - already created (possibly by a concurrent query)
+                if not os.path.isdir(VIZIER_CACHE_DIR):
+                    raise
+            # - written in a unique file then moved: concurrent identical
+            #   queries never share a partial file
+            fd, tmpfile = tempfile.mkstemp(dir=VIZIER_CACHE_DIR, suffix=".fits")
+            with os.fdopen(fd, "wb") as f:
+                t.write(f, format="fits")
+            os.rename(tmpfile, cachefile)
+        except Exception as e:
+            warnings.warn("The Vizier query could not be cached (%s)"%e)
+            if tmpfile is not None and os.path.isfile(tmpfile):
+                os.remove(tmpfile)
+        return t
+    
+    return wrapper
+
+@_cached_vizier
+def _query_vizier_(catalog, columns, column_filters, center, radius,
+                   row_limit="unlimited", **kwargs):
+    """ query the `catalog` in Vizier around `center` and returns the
+    corresponding astropy Table.
+    The table is downloaded in the VIZIER_FORMAT format. Giving any
+    astroquery.vizier.Vizier option (kwargs) forces the 'votable' format.
+    The queries are cached on disk (see VIZIER_CACHE_DIR).
+    """
+    if VIZIER_FORMAT == "votable" or len(kwargs)>0:
+        try:
+            from astroquery import vizier
+        except:
+            raise ImportError("install astroquery. (pip install astroquery)")
+        
+        c = vizier.Vizier(catalog=catalog, columns=columns,
+                          column_filters=column_filters, **kwargs)
+        c.ROW_LIMIT = row_limit
+        return list(c.query_region(center,radius=radius).values())[0]
+    
+    if VIZIER_FORMAT != "fits":
+        raise ValueError("unknown VIZIER_FORMAT '%s' (fits or votable)"%VIZIER_FORMAT)
+    
+    from io import BytesIO
+    from astropy.io import fits as pf
+    from astropy.table import Table
+    try:
+        from urllib.request import urlopen
+        from urllib.parse import urlencode
+    except ImportError:
+        from urllib2 import urlopen
+        from urllib import urlencode
+
+    # -- ASU query
+    if "ra" in dir(center):
+        center = "%.8f %+.8f"%(center.ra.deg, center.dec.deg)
+    query = [("-source",catalog), ("-c",center),
+             ("-c.rm","%.8f"%coordinates.Angle(radius).to("arcmin").value),
+             ("-oc.form","dec"), ("-out.max",row_limit),
+             ("-out",",".join(columns))]
+    query += [(k,v) for k,v in column_filters.items()]
+    
+    url = "http://%s/viz-bin/asu-binfits?%s"%(VIZIER_SERVER,urlencode(query))
+    hdulist = pf.open(BytesIO(urlopen(url, timeout=VIZIER_TIMEOUT).read()))
+    if len(hdulist) < 2:
+        raise IOError("No entry returned by Vizier for %s around %s"%(catalog,center))
+    
+    # - columns read without copy (as astropy's fits reader does)
+    return _astroquery_colnames_(Table.read(hdulist, format="fits", hdu=1))
+
+def _query_vizier_tap_(table, columns, column_filters, targets, radius,
+                       key_ra, key_dec, **kwargs):
+    """ cross-match the `targets` with the Vizier `table` (e.g. V/139/sdss9)
+    in a single TAPVizieR query: the targets are uploaded and joined
+    with the catalogue on the server side.
+
+    Parameters
+    ----------
+    targets: [astropy.Table or dict]
+        must contain 'ra' and 'dec' (in degree) entries and may contain
+        an 'id' entry (the target index is used otherwise)
+
+    key_ra, key_dec: [string, string]
+        the catalogue's coordinate columns used for the match.
+
+    **kwargs goes to pyvo's TAPService.run_async (e.g. maxrec)
+
+    Returns
+    -------
+    astropy Table (with an additional 'target_id' column)
+    """
+    try:
+        import pyvo
+    except ImportError:
+        raise ImportError("install pyvo. (pip install pyvo)")
+    from astropy.table import Table
+    
+    ra,dec = np.asarray(targets["ra"],dtype="float"),np.asarray(targets["dec"],dtype="float")
+    ids = np.asarray(targets["id"]) if "id" in targets.keys() else np.arange(len(ra))
+    upload = Table([ids,ra,dec], names=["id","ra","dec"])
+    
+    query = "SELECT t.id AS target_id, %s FROM \"%s\" AS c, TAP_UPLOAD.targets AS t"%(
+        ", ".join(['c."%s"'%col for col in columns]), table) +\
+      " WHERE 1=CONTAINS(POINT('ICRS', c.\"%s\", c.\"%s\"), CIRCLE('ICRS', t.ra, t.dec, %.8f))"%(
+        key_ra, key_dec, coordinates.Angle(radius).to("deg").value)
+    for k,v in column_filters.items():
+        query += " AND "+_vizier_filter_to_adql_('c."%s"'%k, v)
+    
+    service = pyvo.dal.TAPService(TAPVIZIER_URL)
+    return _astroquery_colnames_(service.run_async(query, uploads={"targets":upload},
+                                                   **kwargs).to_table())
+
+def _vizier_filter_to_adql_(column, constraint):
+    """ convert a simple Vizier column constraint ('a..b', 'a,b,c' or 'a')
+    into its ADQL equivalent. Any other constraint (e.g. '<25', '..25',
+    '!=3') raises a ValueError. """
+    def _value_(v):
+        v = v.strip()
+        try:
+            float(v)
+            return v
+        except ValueError:
+            if re.match(r"^[A-Za-z0-9_+\-. ]+$", v) is None:
+                raise ValueError("Unsupported Vizier constraint '%s' for %s "%(constraint,column)+\
+                                 "(only 'a..b', 'a,b,c' or 'a' are converted to ADQL)")
+            return "'%s'"%v
+        
+    constraint = str(constraint)
+    if ".." in constraint:
+        if constraint.count("..") != 1:
+            raise ValueError("Unsupported Vizier constraint '%s' for %s"%(constraint,column))
+        low,high = constraint.split("..")
+        return "%s BETWEEN %s AND %s"%(column,_value_(low),_value_(high))
+    if "," in constraint:
+        return "%s IN (%s)"%(column,", ".join([_value_(v) for v in constraint.split(",")]))
+    return "%s = %s"%(column,_value_(constraint))
+
+def _astroquery_colnames_(table):
+    """ rename the columns as astroquery's VOTable parser does
+    (e.g. <Gmag> -> __Gmag_) """
+    from astropy.utils.xml.check import fix_id
+    for name in table.colnames:
+        if fix_id(name) != name:
+            table.rename_column(name, fix_id(name))
+    return table
+
+def _partition_targets_(catclass, table, **build):
+    """ split the `table` returned by _query_vizier_tap_ into one
+    `catclass` catalogue per target.
+
+    Returns
+    -------
+    dict {target_id: catalogue} (targets without any catalogue entry
+    are not in the dict)
+    """
+    catalogues = {}
+    if len(table) == 0:
+        return catalogues
+    # - single sort, rather than one full-table mask per target
+    grouped = table.group_by("target_id")
+    for id_, group in zip(grouped.groups.keys["target_id"], grouped.groups):
+        cat = catclass(empty=True)
+        cat.create(group, None, copy=False, **build)
+        catalogues[id_] = cat
+    return catalogues
 
 
 # ============================= #
@@ -18,7 +267,7 @@ from ..utils.decorators import _autogen_docstring_inheritance, make_method
 # ============================= #
 @make_method(Catalogue)
 def stellar_density( catalogue, mask=None,
-                     angdist=0.1*units.degree):
+                     angdist=0.1*units.degree, grid=False):
     """ get the stellar density of the catalogue
 
     Parameters
@@ -31,15 +280,57 @@ def stellar_density( catalogue, mask=None,
         By default, (mask=None) the mask will be stars_only=True.
         For instance, a catmag_mask could be a great idea.
         
+    angdist: [astropy.Quantity] -optional-
+        angular distance within which neighbors are counted.
+
+    grid: [bool] -optional-
+        use the numba grid search instead of the KD-tree
+        (see Catalogue.get_nobjects_around)
+
     Return
     ------
-    float
+    array of int (number of objects within angdist, the object itself included)
     """
     mask     = catalogue.get_mask(stars_only=True) if mask is None else mask
-    ra,dec   = catalogue.get(["ra","dec"], mask= mask)
-    skyradec = coordinates.SkyCoord(ra=ra,dec=dec, unit="deg")
+    return catalogue.get_nobjects_around(angdist, mask=mask, grid=grid)
+
+@make_method(Catalogue)
+def density_map(catalogue, nside, mask=None,
+                angdist=0.1*units.degree, nest=False, grid=False):
+    """ get the HEALPix map of the stellar density of the catalogue:
+    the stellar_density of the objects summed within each HEALPix pixel.
+    (healpy is required)
+
+    Parameters
+    ----------
+    catalogue: [Catalogue]
+        the catalogue for which you want the density map.
+
+    nside: [int]
+        HEALPix nside of the map.
+
+    mask, angdist, grid: -optional-
+        see stellar_density
+
+    nest: [bool] -optional-
+        nested pixel ordering if True, ring ordering otherwise.
+
+    Return
+    ------
+    array of float (12*nside**2 pixels)
+    """
+    try:
+        import healpy as hp
+    except ImportError:
+        raise ImportError("install healpy. (pip install healpy)")
     
-    return np.bincount(skyradec.search_around_sky(skyradec,angdist)[0])
+    mask   = catalogue.get_mask(stars_only=True) if mask is None else mask
+    counts = catalogue.stellar_density(mask=mask, angdist=angdist, grid=grid)
+    ra,dec = catalogue.get(["ra","dec"], mask=mask)
+    pixels = hp.ang2pix(nside, np.radians(90-np.asarray(dec)), np.radians(np.asarray(ra)),
+                        nest=nest)
+    # - HEALPix pixels are already integer bins: no histogram needed
+    return np.bincount(pixels, weights=counts, minlength=hp.nside2npix(nside))
     
 
 
@@ -48,8 +339,8 @@ def stellar_density( catalogue, mask=None,
 # All Sky GAIA: Catalogue       #
 #                               #
 #################################
-def fetch_gaia_catalogue(center, radius, extracolumns=[], column_filters={}, **kwargs):
-    """ "query the gaia catalogue thought Vizier (I/337, DR1) using astroquery.
+def fetch_gaia_catalogue(center, radius, extracolumns=None, column_filters=None, **kwargs):
+    """ "query the gaia catalogue thought Vizier (I/337, DR1) (see VIZIER_FORMAT).
     This function requieres an internet connection.
 
     Parameters
@@ -67,39 +358,66 @@ def fetch_gaia_catalogue(center, radius, extracolumns=[], column_filters={}, **k
 
     column_filters: [dict] -optional-
         Selection criterium for the queried catalogue.
+        (default: no selection)
 
-    **kwargs goes to astroquery.vizier.Vizier
+    **kwargs goes to astroquery.vizier.Vizier (forces the VOTable query)
     
     Returns
     -------
     SDSSCatalogue (child of Catalogue)
     
     """
-    try:
-        from astroquery import vizier
-    except:
-        raise ImportError("install astroquery. (pip install astroquery)")
-
     #   Basic Info
     # --------------
-    columns = ["RA_ICRS","DE_ICRS","e_RA_ICRS","e_DE_ICRS","Source","Dup",
-               "o_<Gmag>","<FG>","e_<FG>","<Gmag>","Var"]
-        
-    columns = columns+extracolumns
+    if column_filters is None:
+        column_filters = {}
+    columns = list(_GAIA_COLUMNS)+(extracolumns if extracolumns is not None else [])
     column_quality = {} # Nothing there yet
     
-    c = vizier.Vizier(catalog="I/337/gaia", columns=columns,
-                      column_filters=kwargs_update(column_quality,**column_filters),
-                      **kwargs)
-    c.ROW_LIMIT = "unlimited"
-    
-    t = c.query_region(center,radius=radius).values()[0]
+    t = _query_vizier_("I/337/gaia", columns,
+                       kwargs_update(column_quality,**column_filters),
+                       center, radius, **kwargs)
     
     cat = GAIACatalogue(empty=True)
-    cat.create(t.columns ,None,
+    cat.create(t, None, copy=False,
                key_ra="RA_ICRS",key_dec="DE_ICRS")
     return cat
 
+def fetch_gaia_catalogue_multi(targets, radius, extracolumns=None, column_filters=None, **kwargs):
+    """ query the gaia catalogue (I/337/gaia) around each of the given targets
+    using a single TAPVizieR upload-join query.
+    This is much faster (and lighter for Vizier) than calling
+    fetch_gaia_catalogue for each target.
+    This function requieres an internet connection.
+
+    Parameters
+    ----------
+    targets: [astropy.Table or dict]
+        list of targets. It must contain 'ra' and 'dec' (in degree) entries
+        and may contain an 'id' entry (the target index is used otherwise).
+
+    radius: [string] 'value unit'
+        radius of the region to query around each target.
+
+    extracolumns, column_filters: -optional-
+        see fetch_gaia_catalogue (only 'a..b', 'a,b' or 'a' filters)
+
+    **kwargs goes to pyvo's TAPService.run_async (e.g. maxrec)
+
+    Returns
+    -------
+    dict {target_id: GAIACatalogue}
+    (targets without any catalogue entry within `radius` are not in the dict)
+    """
+    if column_filters is None:
+        column_filters = {}
+    columns = list(_GAIA_COLUMNS)+(extracolumns if extracolumns is not None else [])
+    
+    t = _query_vizier_tap_("I/337/gaia", columns, column_filters,
+                           targets, radius, "RA_ICRS", "DE_ICRS", **kwargs)
+    return _partition_targets_(GAIACatalogue, t,
+                               key_ra="RA_ICRS",key_dec="DE_ICRS")
+
 
 class GAIACatalogue( Catalogue ):
 
@@ -132,8 +450,8 @@ class GAIACatalogue( Catalogue ):
 # BASIC SDSS: Catalogue         #
 #                               #
 #################################
-def fetch_sdss_catalogue(center, radius, extracolumns=[],column_filters={"rmag":"5..25"},**kwargs):
-    """ query online sdss-catalogue in Vizier (V/139, DR9) using astroquery.
+def fetch_sdss_catalogue(center, radius, extracolumns=None,column_filters=None,**kwargs):
+    """ query online sdss-catalogue in Vizier (V/139, DR9) (see VIZIER_FORMAT).
     This function requieres an internet connection.
     
     Parameters
@@ -151,47 +469,67 @@ def fetch_sdss_catalogue(center, radius, extracolumns=[],column_filters={"rmag":
 
     column_filters: [dict] -optional-
         Selection criterium for the queried catalogue.
+        (default: {"rmag":"5..25"})
 
-    **kwargs goes to astroquery.vizier.Vizier
+    **kwargs goes to astroquery.vizier.Vizier (forces the VOTable query)
     
     Returns
     -------
     SDSSCatalogue (child of Catalogue)
     """
-    from .sdss import SDSS_INFO
-    try:
-        from astroquery import vizier
-    except:
-        raise ImportError("install astroquery. (pip install astroquery)")
-    
     # -----------
     # - DL info
-    columns = ["cl","objID",#"SDSS9",
-               "RAJ2000","e_RAJ2000","DEJ2000","e_DEJ2000",
-               #"ObsDate","Q"#"mode",
-               ]
-    for band in SDSS_INFO["bands"]:
-        columns.append("%smag"%band)
-        columns.append("e_%smag"%band)
-    
-    columns = columns+extracolumns
-    column_quality = {"mode":"1","Q":"2.3"}
+    if column_filters is None:
+        column_filters = {"rmag":"5..25"}
+    columns = list(_SDSS_COLUMNS)+(extracolumns if extracolumns is not None else [])
     # - WARNING if discovered that some of the bandmag were missing if too many colums requested
-    c = vizier.Vizier(catalog="V/139", columns=columns,
-                      column_filters=kwargs_update(column_quality,**column_filters),
-                      **kwargs)
-    c.ROW_LIMIT = "unlimited"
-    #try:
-    t = c.query_region(center,radius=radius).values()[0]
-    #except :
-    #    raise IOError("Error while querying the given coords. You might not have an internet connection")
+    t = _query_vizier_("V/139", columns,
+                       kwargs_update(_SDSS_QUALITY,**column_filters),
+                       center, radius, **kwargs)
     
     cat = SDSSCatalogue(empty=True)
-    cat.create(t.columns,None,
+    cat.create(t, None, copy=False,
                key_class="cl",value_star=6,key_id="objID",
                key_ra="RAJ2000",key_dec="DEJ2000")
     return cat
 
+def fetch_sdss_catalogue_multi(targets, radius, extracolumns=None,
+                               column_filters=None, **kwargs):
+    """ query the sdss catalogue (V/139, DR9) around each of the given targets
+    using a single TAPVizieR upload-join query.
+    This is much faster (and lighter for Vizier) than calling
+    fetch_sdss_catalogue for each target.
+    This function requieres an internet connection.
+
+    Parameters
+    ----------
+    targets: [astropy.Table or dict]
+        list of targets. It must contain 'ra' and 'dec' (in degree) entries
+        and may contain an 'id' entry (the target index is used otherwise).
+
+    radius: [string] 'value unit'
+        radius of the region to query around each target.
+
+    extracolumns, column_filters: -optional-
+        see fetch_sdss_catalogue (only 'a..b', 'a,b' or 'a' filters)
+
+    **kwargs goes to pyvo's TAPService.run_async (e.g. maxrec)
+
+    Returns
+    -------
+    dict {target_id: SDSSCatalogue}
+    (targets without any catalogue entry within `radius` are not in the dict)
+    """
+    if column_filters is None:
+        column_filters = {"rmag":"5..25"}
+    columns = list(_SDSS_COLUMNS)+(extracolumns if extracolumns is not None else [])
+    t = _query_vizier_tap_("V/139/sdss9", columns,
+                           kwargs_update(_SDSS_QUALITY,**column_filters),
+                           targets, radius, "RAJ2000", "DEJ2000", **kwargs)
+    return _partition_targets_(SDSSCatalogue, t,
+                               key_class="cl",value_star=6,key_id="objID",
+                               key_ra="RAJ2000",key_dec="DEJ2000")
+
 # ------------------- #
 # - SDSS CATALOGUE  - #
 # ------------------- #
@@ -221,17 +559,16 @@ class SDSSCatalogue( Catalogue ):
         #
         super(SDSSCatalogue,self).set_mag_keys(key_mag,key_magerr)
         if key_mag is not None:
-            bandpass = get_bandpass("sdss%s"%key_mag[0])
-            self.lbda = bandpass.wave_eff
+            self.lbda = _get_sdss_lbda_(key_mag[0])
     
 #################################
 #                               #
 # BASIC 2MASS: Catalogue        #
 #                               #
 #################################
-def fetch_2mass_catalogue(center,radius,extracolumns=[],
-                          column_filters={"Jmag":"5..30"},**kwargs):
-    """ query online 2mass-catalogue in Vizier (II/246) using astroquery.
+def fetch_2mass_catalogue(center,radius,extracolumns=None,
+                          column_filters=None,**kwargs):
+    """ query online 2mass-catalogue in Vizier (II/246) (see VIZIER_FORMAT).
     This function requieres an internet connection.
     
     Parameters
@@ -249,44 +586,71 @@ def fetch_2mass_catalogue(center,radius,extracolumns=[],
 
     column_filters: [dict] -optional-
         Selection criterium for the queried catalogue.
+        (default: {"Jmag":"5..30"})
 
-    **kwargs goes to astroquery.vizier.Vizier
+    **kwargs goes to astroquery.vizier.Vizier (forces the VOTable query)
     
     Returns
     -------
     MASSCatalogue (child of Catalogue)
     """
-    try:
-        from astroquery import vizier
-    except:
-        raise ImportError("install astroquery. (pip install astroquery)")
-    
     # -----------
     # - DL info
-    columns = ["2MASS",
-               "RAJ2000","DEJ2000",
-               ]
-        
-    for band in ["J","H","K"]:
-        columns.append("%smag"%band)
-        columns.append("e_%smag"%band)
-    
-    columns = columns+extracolumns
+    if column_filters is None:
+        column_filters = {"Jmag":"5..30"}
+    columns = list(_MASS_COLUMNS)+(extracolumns if extracolumns is not None else [])
     # - WARNING if discovered that some of the bandmag were missing if too many colums requested
-    c = vizier.Vizier(catalog="II/246", columns=columns, column_filters=column_filters,
-                      **kwargs)
-    c.ROW_LIMIT = 100000
     try:
-        t = c.query_region(center,radius=radius).values()[0]
+        t = _query_vizier_("II/246", columns, column_filters,
+                           center, radius, row_limit=100000, **kwargs)
     except:
         raise IOError("Error while querying the given coords. You might not have an internet connection")
     
     cat = MASSCatalogue(empty=True)
-    cat.create(t.columns,None,
-               key_class="PointSource",value_star=None,
+    cat.create(t, None, copy=False,
                key_ra="RAJ2000",key_dec="DEJ2000")
+    # - not a catalogue entry: all 2MASS data are point sources
+    cat.set_starsid("PointSource", None, testkey=False)
     return cat
 
+def fetch_2mass_catalogue_multi(targets, radius, extracolumns=None,
+                                column_filters=None, **kwargs):
+    """ query the 2mass catalogue (II/246) around each of the given targets
+    using a single TAPVizieR upload-join query.
+    This is much faster (and lighter for Vizier) than calling
+    fetch_2mass_catalogue for each target.
+    This function requieres an internet connection.
+
+    Parameters
+    ----------
+    targets: [astropy.Table or dict]
+        list of targets. It must contain 'ra' and 'dec' (in degree) entries
+        and may contain an 'id' entry (the target index is used otherwise).
+
+    radius: [string] 'value unit'
+        radius of the region to query around each target.
+
+    extracolumns, column_filters: -optional-
+        see fetch_2mass_catalogue (only 'a..b', 'a,b' or 'a' filters)
+
+    **kwargs goes to pyvo's TAPService.run_async (e.g. maxrec)
+
+    Returns
+    -------
+    dict {target_id: MASSCatalogue}
+    (targets without any catalogue entry within `radius` are not in the dict)
+    """
+    if column_filters is None:
+        column_filters = {"Jmag":"5..30"}
+    columns = list(_MASS_COLUMNS)+(extracolumns if extracolumns is not None else [])
+    t = _query_vizier_tap_("II/246/out", columns, column_filters,
+                           targets, radius, "RAJ2000", "DEJ2000", **kwargs)
+    catalogues = _partition_targets_(MASSCatalogue, t,
+                                     key_ra="RAJ2000",key_dec="DEJ2000")
+    for cat in catalogues.values():
+        cat.set_starsid("PointSource", None, testkey=False)
+    return catalogues
+
 # ------------------- #
 # - 2MASS CATALOGUE - #
 # ------------------- #
@@ -295,6 +659,8 @@ class MASSCatalogue( Catalogue ):
     """
     source_name = "2MASS"
     
+    DERIVED_PROPERTIES = ["objecttype","starmask"]
+    
     def __init__(self, catalogue_file=None,empty=False,
                  key_mag=None,key_magerr=None,key_ra=None,key_dec=None,**kwargs):
         """
@@ -306,7 +672,7 @@ class MASSCatalogue( Catalogue ):
             return
         
         self.load(catalogue_file,**kwargs)        
-    
+
     @_autogen_docstring_inheritance(Catalogue.set_mag_keys,"Catalogue.set_mag_keys")
     def set_mag_keys(self,key_mag,key_magerr):
         #
@@ -314,21 +680,16 @@ class MASSCatalogue( Catalogue ):
         #
         super(MASSCatalogue,self).set_mag_keys(key_mag,key_magerr)
         if key_mag is not None:
-            if key_mag == "Jmag":
-                self.lbda = 12350
-            elif key_mag == "Hmag":
-                self.lbda = 16620
-            elif key_mag == "Kmag":
-                self.lbda = 21590
-            else:
-                raise ValueError("'%s' is not a recognized 2MASS band")
+            if key_mag not in _MASS_LBDA.keys():
+                raise ValueError("'%s' is not a recognized 2MASS band"%key_mag)
+            self.lbda = _MASS_LBDA[key_mag]
     # ----------------------- #
     # -  CATALOGUE HACK     - #
     # ----------------------- #
     @property
     def mag(self):
         if not self._is_keymag_set_(verbose=False):
-            print "No 'key_mag' defined. J band used by default. -> To change: set_mag_keys() "
+            _log.info("No 'key_mag' defined. J band used by default. -> To change: set_mag_keys() ")
             self.set_mag_keys("Jmag","e_Jmag")
             
         return super(MASSCatalogue,self).mag
@@ -337,8 +698,10 @@ class MASSCatalogue( Catalogue ):
     # - All points are Point Sources
     @property
     def _objecttype(self):
-        print "All Loaded data are %s"%self._build_properties["key_class"]
-        return np.ones(self.nobjects)
+        if self._derived_properties["objecttype"] is None:
+            _log.debug("All Loaded data are %s", self._build_properties["key_class"])
+            self._derived_properties["objecttype"] = np.ones(self.nobjects)
+        return self._derived_properties["objecttype"]
 
     @property
     def starmask(self):
@@ -347,7 +710,22 @@ class MASSCatalogue( Catalogue ):
         in the __build_properties to be able to have access to this mask
         ==> In 2MASS PointSource catalogue, all data are stars
         """
-        return np.ones(self.nobjects_in_fov,dtype="bool")  #not self.fovmask already in objecttype
+        # - rebuilt only if the fov changed
+        if self._derived_properties["starmask"] is None or \
+          len(self._derived_properties["starmask"]) != np.count_nonzero(self.fovmask):
+            self._derived_properties["starmask"] = \
+              np.ones(np.count_nonzero(self.fovmask),dtype="bool")  #not self.fovmask already in objecttype
+        return self._derived_properties["starmask"]
+
+    # =========================== #
+    # Internal Methods            #
+    # =========================== #
+    def _reset_caches_(self):
+        """ drop the derived quantities cached on the current data
+        (the cached masks included) """
+        super(MASSCatalogue,self)._reset_caches_()
+        self._derived_properties["objecttype"] = None
+        self._derived_properties["starmask"] = None
 
 
 #################################
@@ -355,8 +733,8 @@ class MASSCatalogue( Catalogue ):
 # BASIC WISE: Catalogue         #
 #                               #
 #################################
-def fetch_wise_catalogue(center,radius,extracolumns=[],column_filters={"Jmag":"5..30"}):
-    """ query online wise-catalogue in Vizier (II/328) using astroquery.
+def fetch_wise_catalogue(center,radius,extracolumns=None,column_filters=None,**kwargs):
+    """ query online wise-catalogue in Vizier (II/328) (see VIZIER_FORMAT).
     This function requieres an internet connection.
     
     Parameters
@@ -374,44 +752,71 @@ def fetch_wise_catalogue(center,radius,extracolumns=[],column_filters={"Jmag":"5
 
     column_filters: [dict] -optional-
         Selection criterium for the queried catalogue.
+        (default: {"Jmag":"5..30"})
 
-    **kwargs goes to astroquery.vizier.Vizier
+    **kwargs goes to astroquery.vizier.Vizier (forces the VOTable query)
     
     Returns
     -------
     WISECatalogue (child of Catalogue)
     """
-    try:
-        from astroquery import vizier
-    except:
-        raise ImportError("install astroquery. (pip install astroquery)")
-    
     # -----------
     # - DL info
-    columns = ["AllWISE","ID",
-               "RAJ2000","DEJ2000",
-               ]
-        
-    for band in ["J","H","K","W1","W2","W3","W4"]:
-        columns.append("%smag"%band)
-        columns.append("e_%smag"%band)
-    
-    columns = columns+extracolumns
+    if column_filters is None:
+        column_filters = {"Jmag":"5..30"}
+    columns = list(_WISE_COLUMNS)+(extracolumns if extracolumns is not None else [])
     # - WARNING if discovered that some of the bandmag were missing if too many colums requested
-    c = vizier.Vizier(catalog="II/328", columns=columns, column_filters=column_filters,
-                      **kwargs)
-    c.ROW_LIMIT = 100000
     try:
-        t = c.query_region(center,radius=radius).values()[0]
+        t = _query_vizier_("II/328", columns, column_filters,
+                           center, radius, row_limit=100000, **kwargs)
     except:
         raise IOError("Error while querying the given coords. You might not have an internet connection")
     
     cat = WISECatalogue(empty=True)
-    cat.create(t.columns,None,
-               key_class="ToBeDone",value_star=None,
+    cat.create(t, None, copy=False,
                key_ra="RAJ2000",key_dec="DEJ2000")
+    # - not a catalogue entry: star/galaxy parsing not ready yet
+    cat.set_starsid("ToBeDone", None, testkey=False)
     return cat
 
+def fetch_wise_catalogue_multi(targets, radius, extracolumns=None,
+                               column_filters=None, **kwargs):
+    """ query the wise catalogue (II/328) around each of the given targets
+    using a single TAPVizieR upload-join query.
+    This is much faster (and lighter for Vizier) than calling
+    fetch_wise_catalogue for each target.
+    This function requieres an internet connection.
+
+    Parameters
+    ----------
+    targets: [astropy.Table or dict]
+        list of targets. It must contain 'ra' and 'dec' (in degree) entries
+        and may contain an 'id' entry (the target index is used otherwise).
+
+    radius: [string] 'value unit'
+        radius of the region to query around each target.
+
+    extracolumns, column_filters: -optional-
+        see fetch_wise_catalogue (only 'a..b', 'a,b' or 'a' filters)
+
+    **kwargs goes to pyvo's TAPService.run_async (e.g. maxrec)
+
+    Returns
+    -------
+    dict {target_id: WISECatalogue}
+    (targets without any catalogue entry within `radius` are not in the dict)
+    """
+    if column_filters is None:
+        column_filters = {"Jmag":"5..30"}
+    columns = list(_WISE_COLUMNS)+(extracolumns if extracolumns is not None else [])
+    t = _query_vizier_tap_("II/328/allwise", columns, column_filters,
+                           targets, radius, "RAJ2000", "DEJ2000", **kwargs)
+    catalogues = _partition_targets_(WISECatalogue, t,
+                                     key_ra="RAJ2000",key_dec="DEJ2000")
+    for cat in catalogues.values():
+        cat.set_starsid("ToBeDone", None, testkey=False)
+    return catalogues
+
 # ------------------- #
 # - WISE CATALOGUE  - #
 # ------------------- #
@@ -425,7 +830,7 @@ class WISECatalogue( Catalogue ):
         """
         """
         
-        print "STAR vs. GALAXY PARSING NOT READY YET"
+        warnings.warn("STAR vs. GALAXY PARSING NOT READY YET")
         
         self.__build__(data_index=2,key_mag=key_mag,
                        key_magerr=key_magerr,
@@ -447,7 +852,7 @@ class WISECatalogue( Catalogue ):
     @property
     def mag(self):
         if not self._is_keymag_set_(verbose=False):
-            print "No 'key_mag' defined. W1 band used by default. -> To change: set_mag_keys() "
+            _log.info("No 'key_mag' defined. W1 band used by default. -> To change: set_mag_keys() ")
             self.set_mag_keys("W1mag","e_W1mag")
             
         return super(WISECatalogue,self).mag
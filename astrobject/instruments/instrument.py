@@ -11,12 +11,13 @@ import stella
 import ptf
 import snifs
 
-__all__ = ["get_instrument","get_catalogue","fetch_catalogue"]
+__all__ = ["get_instrument","get_catalogue","fetch_catalogue",
+           "fetch_catalogues_parallel"]
 
 KNOWN_INSTRUMENTS = ["sdss","snifs","hst","stella","ptf"]
 
 
-def fetch_catalogue(source,radec,radius,extracolumns=[],column_filters={"rmag":"5..25"},**kwargs):
+def fetch_catalogue(source,radec,radius,extracolumns=None,column_filters=None,**kwargs):
     """ Download a catalogue from internet (Vizier)
     (Module based on astroquery.)
 
@@ -45,6 +46,7 @@ def fetch_catalogue(source,radec,radius,extracolumns=[],column_filters={"rmag":"
         This should be a dictionary with keys being column names (see Vizier)
         Column name depend on the catalogues.
         Example: If you only want stars for the sdss catalogue add  'cl':6
+        (default: the catalogue's own, see catalogues.fetch_*_catalogue)
 
     **kwargs goes to vizier.Vizier
 
@@ -55,7 +57,7 @@ def fetch_catalogue(source,radec,radius,extracolumns=[],column_filters={"rmag":"
     
     if type(radec) is not str:
         if len(radec) != 2: raise TypeError("radec must be a string ('ra dec') or a 2D array ([ra,dec])")
-        radec = "%f %f"(radec[0],radec[1])
+        radec = "%f %f"%(radec[0],radec[1])
 
     # Test if catalog exist
     if not hasattr(catalogues, "fetch_%s_catalogue"%source.lower()):
@@ -65,6 +67,38 @@ def fetch_catalogue(source,radec,radius,extracolumns=[],column_filters={"rmag":"
                                     "extracolumns=extracolumns,"+\
                                     "column_filters=column_filters,**kwargs)")
 
+def fetch_catalogues_parallel(queries, nthreads=None):
+    """ Download several catalogues from internet (Vizier) at once.
+    The queries are network bound, so they are sent in parallel
+    (one thread per query) and the total time is that of the slowest
+    query instead of the sum of them.
+
+    Parameters
+    ----------
+    queries: [list of dict]
+        one dictionary per catalogue, containing the fetch_catalogue
+        arguments (source, radec, radius, ...).
+        e.g. [{"source":"sdss","radec":"10 20","radius":"1d"},
+              {"source":"2mass","radec":"10 20","radius":"1d"}]
+
+    nthreads: [int] -optional-
+        maximum number of simultaneous queries (default one per query)
+
+    Returns
+    -------
+    list of Catalogues (same order as queries)
+    """
+    from multiprocessing.pool import ThreadPool
+    if len(queries) == 0:
+        return []
+    
+    pool = ThreadPool(len(queries) if nthreads is None else nthreads)
+    try:
+        return pool.map(lambda query: fetch_catalogue(**query), queries)
+    finally:
+        pool.close()
+        pool.join()
+
 def get_catalogue(filename, source,**kwargs):
     """ Reads the given catalogue file and open its corresponding Catalogue
 
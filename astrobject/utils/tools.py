@@ -113,6 +113,19 @@ def hourangle_2_degree(ra_hours,dec_hours,obstime="J2000"):
                  unit=(u.hourangle, u.deg), obstime=obstime)
     return c.ra.value,c.dec.value
 
+def radec_to_xyz(ra,dec):
+    """ convert the given ra, dec (in degree) into cartesian coordinates
+    on the unit sphere.
+
+    Returns
+    -------
+    (N,3) float array
+    """
+    ra_,dec_ = np.radians(np.atleast_1d(ra)),np.radians(np.atleast_1d(dec))
+    cosdec = np.cos(dec_)
+    return np.asarray([cosdec*np.cos(ra_), cosdec*np.sin(ra_), np.sin(dec_)],
+                      dtype="float64").T
+
 
 # --------------------------- #
 # - Array Tools             - #
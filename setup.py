@@ -31,6 +31,10 @@ def check_dependencies():
        import astropy
    except ImportError:
        install_requires.append('astropy')
+   try:
+       import scipy
+   except ImportError:
+       install_requires.append('scipy')
    try:
        import astroquery
    except ImportError: